@@ -1,148 +1,423 @@
 from mcp.server.fastmcp import FastMCP
 import docker
+import asyncio
+import contextlib
+import functools
+import io
+import operator
 import os
 import tempfile
 import shutil
 import argparse
 import pathlib
 import logging
+import logging.handlers
+import queue
+import secrets
 import time
 import atexit
+import signal
+import socket
+import tarfile
+import textwrap
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Create MCP server
 mcp = FastMCP("Docker Python Execution")
-client = docker.from_env()
+client = None  # Docker client, created in main() once the pool size is known
 code_dir = None
+code_dir_path = None  # Resolved pathlib.Path of code_dir, computed once in main()
+code_dir_prefix = None  # str(code_dir_path) with a trailing separator, for containment checks
 image_name = None
+image_id = None  # Content-addressed id of image_name, resolved on first container creation
+_image_lock = threading.Lock()  # Serializes that resolution, which may pull the image
+exec_dir = None  # Host tmpfs directory scripts are staged in; None to copy them into the container
+exec_mount = None  # Where exec_dir is visible inside the containers
+container_host_config = None  # HostConfig shared by all pool containers, built once in main()
+exec_executor = None  # Worker threads for code execution, sized to the pool in main()
+docker_io_executor = None  # Shared worker threads for background Docker calls, created in main()
+cleanup_executor = None  # Worker threads for cleanup_code_directory, created once in main()
+container_env = None  # Non-system environment variables passed to containers, filtered once in main()
+max_parallel_exec = None  # Cap on concurrently running executions, set in main()
+exec_semaphore = None  # asyncio.Semaphore enforcing max_parallel_exec, created on first use
+max_output_bytes = None  # Cap on captured output per execution, set in main()
+max_read_bytes = None  # Largest file read_file returns, set in main()
+exec_timeout = None  # Wall-clock limit in seconds for one execution, set in main()
+
+# Environment variables starting with these are host/system settings and are not passed to containers.
+# A tuple so str.startswith can test all prefixes in one C-level call.
+SYSTEM_ENV_PREFIXES = (
+    "PATH", "TEMP", "TMP", "HOME", "USER", 
+    "APPDATA", "LOCALAPPDATA", "PROGRAMDATA",
+    "SYSTEM", "PUBLIC", "COMPUTER", "OS", 
+    "PROCESSOR", "PROGRAM", "WIN", "COMMON",
+)
+
+# Default cap on captured stdout/stderr per execution; bounds server memory for runaway scripts
+MAX_OUTPUT_BYTES = 8 * 1024 * 1024
+# Default wall-clock limit per execution, in seconds
+EXEC_TIMEOUT = 300
+# Bounded wait for an exec's exit code once its output stream has ended
+EXIT_CODE_POLLS = 20
+EXIT_CODE_POLL_INTERVAL = 0.05
+# Default size limit for read_file; larger files are refused rather than loaded into memory
+MAX_READ_BYTES = 8 * 1024 * 1024
+# File name of the staged script, in the container's script directory or /tmp
+IN_CONTAINER_SCRIPT = "script.py"
+# Label marking pool containers; the value is "<host>:<pid>" of the owning server
+POOL_LABEL = "mcp-python-exec.owner"
+# Concurrent background Docker calls (container removal, pre-warming); bounds load on the daemon
+DOCKER_IO_WORKERS = 4
+# Threads cleanup_code_directory removes top-level entries with in parallel
+CLEANUP_WORKERS = 8
+
+# Packages preinstalled in the execution image (Docker/requirements.txt)
+EXECUTION_PACKAGES = (
+    "pandas", "numpy", "matplotlib", "seaborn", "plotly", "bokeh", "hvplot",
+    "datashader", "plotnine", "cufflinks", "graphviz", "scipy", "statsmodels",
+    "openpyxl", "xlrd", "xlsxwriter", "pandasql", "csv23", "csvkit", "polars",
+    "pyarrow", "fastparquet", "dask", "vaex", "python-dateutil", "elasticsearch",
+    "psycopg2-binary", "beautifulsoup4", "requests", "lxml", "geopandas",
+    "folium", "pydeck", "holoviews", "altair", "visualkeras", "kaleido",
+    "panel", "voila", "pymongo",
+)
+
+# Built once at import; FastMCP stores it with the tool and serves it on every tools/list
+EXECUTE_TOOL_DESCRIPTION = f"""Execute Python code in a Docker container. The environment is limited to the container.
+Following packages are available:
+{textwrap.fill(", ".join(f'"{package}"' for package in EXECUTION_PACKAGES), width=80)}
+
+Use following environment variables (if the connection string is available):
+- MONGO_URI: MongoDB connection string
+- ELASTIC_URI: ElasticSearch connection string
+- REDIS_URI: Redis connection string
+- POSTGRES_URI: PostgreSQL connection string
+- MYSQL_URI: MySQL connection string
+
+Args:
+    code: Python code to execute
+
+Returns:
+    Output from executed code
+"""
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Records are handed to a listener thread, so request threads never block
+# on the stderr write. force=True because constructing FastMCP above already
+# installed a root handler, which would make basicConfig a no-op.
+_log_queue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(_log_queue, _log_output)
+log_listener.start()
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[logging.handlers.QueueHandler(_log_queue)], force=True)
+logger = logging.getLogger(__name__)
 
 # Container management
 class ContainerManager:
     def __init__(self, max_idle_time=600, max_containers=10):  # 600 seconds = 10 minutes
-        self.containers = {}  # Map of container_id -> {'container': container_obj, 'last_used': timestamp, 'busy': bool}
+        self.containers = {}  # Map of container_id -> {'container': container_obj, 'last_used': timestamp, 'busy': bool, 'script_dir': host dir or None}
+        # Ids of idle containers, most recently released last. Every removal of
+        # an idle container also drops its id, so this never outgrows the pool.
+        self._free = deque()
         self.max_idle_time = max_idle_time
         self.max_containers = max_containers
         self.lock = threading.RLock()
-        self.cleanup_thread = None
+        # Signalled whenever a container becomes available or the pool shrinks,
+        # so waiters never poll
+        self._cv = threading.Condition(self.lock)
+        # Containers being created outside the lock; they count against max_containers
+        self._creating = 0
+        # One-shot timer for the earliest idle expiry; only armed while some
+        # container is idle, so an unused server never wakes up
+        self.cleanup_timer = None
+        self._cleanup_due = None
+        self.event_thread = None
+        self.event_stream = None
         self.running = True
     
-    def start_cleanup_thread(self):
-        """Start a background thread to periodically clean up idle containers"""
-        self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
-        self.cleanup_thread.start()
-        logging.info("Container cleanup thread started")
+    def _schedule_cleanup(self, due):
+        """Make sure idle cleanup runs by time due; caller holds the lock"""
+        if not self.running:
+            return
+        if self.cleanup_timer is not None:
+            if self._cleanup_due <= due:
+                return
+            self.cleanup_timer.cancel()
+        # A second of slack so the container has definitely expired by then
+        self.cleanup_timer = threading.Timer(max(due - time.time(), 0) + 1, self._on_cleanup_timer)
+        self.cleanup_timer.daemon = True
+        self._cleanup_due = due
+        self.cleanup_timer.start()
+    
+    def _on_cleanup_timer(self):
+        """Remove expired containers, then re-arm for the next idle one to expire"""
+        with self.lock:
+            # A replacement may have been armed while this one was firing
+            if self.cleanup_timer is threading.current_thread():
+                self.cleanup_timer = None
+        self.cleanup_idle_containers()
+        with self.lock:
+            idle_since = [info['last_used'] for info in self.containers.values() if not info['busy']]
+            if idle_since:
+                self._schedule_cleanup(min(idle_since) + self.max_idle_time)
+    
+    def stop_cleanup_timer(self):
+        """Stop scheduling idle cleanup"""
+        with self.lock:
+            self.running = False
+            if self.cleanup_timer is not None:
+                self.cleanup_timer.cancel()
+                self.cleanup_timer = None
     
-    def _cleanup_loop(self):
-        """Background thread that periodically cleans up idle containers"""
-        while self.running:
-            time.sleep(60)  # Check every minute
-            self.cleanup_idle_containers()
+    def start_event_thread(self, docker_client):
+        """Start a background thread that drops pooled containers as soon as they die"""
+        self.event_thread = threading.Thread(target=self._event_loop, args=(docker_client,), daemon=True)
+        self.event_thread.start()
+        logger.info("Container event thread started")
+    
+    def _event_loop(self, docker_client):
+        """Background thread that subscribes to and consumes the Docker events stream"""
+        try:
+            # One long-lived events subscription instead of probing container
+            # state per call; opened here so startup never waits on the daemon
+            event_stream = docker_client.events(
+                decode=True,
+                filters={'type': 'container', 'event': 'die'}
+            )
+            with self.lock:
+                if self.running:
+                    self.event_stream = event_stream
+            if self.event_stream is not event_stream:
+                # Shut down while subscribing
+                event_stream.close()
+                return
+            for event in event_stream:
+                container_id = event.get('id')
+                # Most die events are for containers outside the pool (or ones we
+                # removed ourselves); discard_container is a cheap no-op for those
+                if self.discard_container(container_id):
+                    logger.warning("Pooled container %s exited unexpectedly, removed it from the pool", container_id)
+        except Exception as e:
+            if self.running:
+                logger.warning("Container event stream stopped: %s", e)
     
     def cleanup_idle_containers(self):
         """Remove containers that have been idle for too long"""
         now = time.time()
-        to_remove = []
+        removed = []
         
         with self.lock:
-            # Identify containers to remove
-            for container_id, info in self.containers.items():
+            # Only pop the entries here; the Docker calls happen after the lock is released
+            for container_id, info in list(self.containers.items()):
                 # Only remove non-busy containers
                 if not info['busy'] and now - info['last_used'] > self.max_idle_time:
-                    to_remove.append(container_id)
-            
-            # Remove identified containers
-            for container_id in to_remove:
-                try:
-                    container = self.containers[container_id]['container']
-                    logging.info(f"Removing idle container {container_id} (idle for {now - self.containers[container_id]['last_used']:.1f} seconds)")
-                    container.remove(force=True)
-                    del self.containers[container_id]
-                except Exception as e:
-                    logging.warning(f"Error removing container {container_id}: {e}")
+                    logger.info("Removing idle container %s (idle for %.1f seconds)", container_id, now - info['last_used'])
+                    removed.append(self.containers.pop(container_id))
+                    # At most max_containers steps; LIFO pops would otherwise
+                    # only reach these ids once the deque fully drains
+                    self._free.remove(container_id)
+            if removed:
+                # Waiters may now create a container in the freed slots
+                self._cv.notify_all()
+        
+        self._remove_containers(removed)
     
-    def add_container(self, container):
-        """Add a container to be managed"""
-        with self.lock:
-            self.containers[container.id] = {
-                'container': container,
-                'last_used': time.time(),
-                'busy': False  # Initially not busy
-            }
-            logging.info(f"Added container {container.id} to manager")
+    @staticmethod
+    def _remove_containers(infos, parallel=True):
+        """Force-remove containers and their script directories; call without holding the lock"""
+        def remove(info):
+            container = info['container']
+            try:
+                container.remove(force=True)
+            except docker.errors.NotFound:
+                pass
+            except Exception as e:
+                logger.warning("Error removing container %s: %s", container.id, e)
+            if info['script_dir']:
+                shutil.rmtree(info['script_dir'], ignore_errors=True)
+        
+        if parallel and len(infos) > 1 and docker_io_executor is not None:
+            list(docker_io_executor.map(remove, infos))
+        else:
+            for info in infos:
+                remove(info)
+    
+    def add_container(self, container, busy=False, script_dir=None, reserved=False):
+        """Add a container to be managed.
+
+        Pass busy=True when the caller is about to use the container itself, so
+        no other request can pick it up in the meantime. script_dir is the host
+        directory mounted as the container's exec_mount, removed along with it.
+        Pass reserved=True when the container fills a slot from acquire_container
+        or reserve_slot.
+        """
+        info = {
+            'container': container,
+            'last_used': time.time(),
+            'busy': busy,
+            'script_dir': script_dir
+        }
+        with self._cv:
+            if reserved:
+                self._creating -= 1
+            shutting_down = not self.running
+            if not shutting_down:
+                self.containers[container.id] = info
+            if not busy and not shutting_down:
+                self._free.append(container.id)
+                self._cv.notify()
+                self._schedule_cleanup(info['last_used'] + self.max_idle_time)
+        if shutting_down:
+            # Created after cleanup_all already ran (e.g. by the background
+            # pre-warm); nothing else would ever remove it
+            self._remove_containers([info], parallel=False)
+            return
+        logger.info("Added container %s to manager", container.id)
+    
+    def discard_container(self, container_id):
+        """Stop tracking a container and remove it, e.g. after it died; False if it was not tracked"""
+        with self._cv:
+            info = self.containers.pop(container_id, None)
+            if info is not None:
+                if not info['busy']:
+                    self._free.remove(container_id)
+                # Waiters may now create a container in the freed slot
+                self._cv.notify_all()
+        if info is None:
+            return False
+        self._remove_containers([info])
+        return True
+    
+    def get_script_dir(self, container_id):
+        """Host script directory of a pooled container, or None"""
+        info = self.containers.get(container_id)
+        return info['script_dir'] if info else None
     
     def get_container_count(self):
         """Get the number of containers being managed"""
-        with self.lock:
-            return len(self.containers)
+        # len() of a dict is atomic, and the count is only a snapshot either way
+        return len(self.containers)
     
-    def get_available_container(self):
-        """Get an available container for reuse or None if none available"""
-        with self.lock:
-            for container_id, info in self.containers.items():
-                if not info['busy']:
-                    # Mark as busy and return
-                    info['busy'] = True
-                    info['last_used'] = time.time()  # Update last used time
-                    logging.info(f"Reusing existing container {container_id}")
-                    return info['container']
+    def _try_acquire(self):
+        """Mark an idle container as busy and return it, or None; caller holds the lock"""
+        if not self._free:
             return None
+        # LIFO: reuse the warmest container and let the rest age out
+        info = self.containers[self._free.pop()]
+        info['busy'] = True
+        info['last_used'] = time.time()  # Update last used time
+        return info['container']
     
-    def mark_container_as_available(self, container_id):
-        """Mark a container as no longer busy"""
-        with self.lock:
-            if container_id in self.containers:
-                self.containers[container_id]['busy'] = False
-                self.containers[container_id]['last_used'] = time.time()
-                logging.info(f"Container {container_id} marked as available for reuse")
+    def acquire_container(self, timeout=0):
+        """Check out an idle container, or reserve a slot to create one.
+
+        Waits up to timeout seconds for either. Returns (container, False) for
+        an idle container, (None, True) for a reserved slot, and (None, False)
+        if neither became available. The caller creates the container outside
+        the lock and passes reserved=True to add_container, or calls
+        release_reservation if creation fails.
+        """
+        result = (None, False)
+        
+        def ready():
+            nonlocal result
+            container = self._try_acquire()
+            if container is not None:
+                result = (container, False)
+            elif len(self.containers) + self._creating < self.max_containers:
+                self._creating += 1
+                result = (None, True)
+            return result[0] is not None or result[1]
+        
+        with self._cv:
+            self._cv.wait_for(ready, timeout=timeout)
+        return result
     
-    def update_last_used(self, container_id):
-        """Update the last used timestamp for a container"""
-        with self.lock:
-            if container_id in self.containers:
-                self.containers[container_id]['last_used'] = time.time()
+    def reserve_slot(self):
+        """Reserve a slot to create a container in without checking out an idle one; False if the pool is full"""
+        with self._cv:
+            if len(self.containers) + self._creating >= self.max_containers:
+                return False
+            self._creating += 1
+            return True
     
-    def should_create_new_container(self):
-        """Check if we should create a new container based on current count"""
-        with self.lock:
-            # If we have fewer containers than max_containers, we can create a new one
-            return len(self.containers) < self.max_containers
+    def release_reservation(self):
+        """Give back a slot from acquire_container whose container was never added"""
+        with self._cv:
+            self._creating -= 1
+            self._cv.notify()
+    
+    def mark_container_as_available(self, container_id):
+        """Mark a container as no longer busy"""
+        now = time.time()
+        with self._cv:
+            info = self.containers.get(container_id)
+            if info is None or not info['busy']:
+                return
+            info['busy'] = False
+            info['last_used'] = now
+            self._free.append(container_id)
+            self._cv.notify()
+            self._schedule_cleanup(now + self.max_idle_time)
+        logger.debug("Container %s marked as available for reuse", container_id)
     
     def cleanup_all(self):
         """Remove all containers being managed"""
-        self.running = False
         with self.lock:
-            for container_id, info in list(self.containers.items()):
-                try:
-                    container = info['container']
-                    logging.info(f"Removing container {container_id} during cleanup")
-                    container.remove(force=True)
-                except Exception as e:
-                    logging.warning(f"Error removing container {container_id} during cleanup: {e}")
+            self.running = False
+            event_stream = self.event_stream
+        if event_stream is not None:
+            # Closing can fail (DockerException on ssh:// hosts, OSError on a
+            # socket the daemon already dropped); the containers must still go
+            try:
+                event_stream.close()
+            except Exception as e:
+                logger.warning("Error closing container event stream: %s", e)
+        with self.lock:
+            removed = list(self.containers.values())
             self.containers.clear()
-        logging.info("All containers cleaned up")
+            self._free.clear()
+        logger.info("Removing %d containers during cleanup", len(removed))
+        # This runs from atexit, where executors no longer accept new work
+        self._remove_containers(removed, parallel=False)
+        logger.info("All containers cleaned up")
 
 # Create a container manager
 container_manager = ContainerManager()
 
 # Register the cleanup function to run when the server exits
 def cleanup_on_exit():
-    logging.info("Shutting down server, cleaning up resources...")
-    # Stop the cleanup thread
-    container_manager.running = False
-    if container_manager.cleanup_thread and container_manager.cleanup_thread.is_alive():
-        container_manager.cleanup_thread.join(timeout=5)
+    logger.info("Shutting down server, cleaning up resources...")
+    # Stop idle cleanup; unlike the old polling thread there is nothing to join
+    container_manager.stop_cleanup_timer()
     # Clean up all containers
     container_manager.cleanup_all()
-    logging.info("Cleanup complete")
+    if exec_dir:
+        # Per-container script directories are gone; drop the staging root too
+        shutil.rmtree(exec_dir, ignore_errors=True)
+    logger.info("Cleanup complete")
+    # Drain any queued log records before the interpreter exits
+    log_listener.stop()
 
 atexit.register(cleanup_on_exit)
 
+def _exit_on_signal(signum, frame):
+    """Clean up and exit on a termination signal.
+
+    Raising SystemExit is not enough: the interpreter first joins non-daemon
+    threads (the stdio reader, busy execution workers) and can hang there
+    before atexit handlers ever run. So clean up here and exit immediately.
+    """
+    logger.info("Received signal %s, exiting", signum)
+    cleanup_on_exit()
+    os._exit(0)
+
 def main():
     """Entry point for the MCP server"""
-    global image_name, code_dir
+    global client, image_name, code_dir, code_dir_path, code_dir_prefix, exec_dir, exec_mount, container_host_config, exec_executor, docker_io_executor, cleanup_executor, max_parallel_exec, max_output_bytes, max_read_bytes, exec_timeout, container_env
     parser = argparse.ArgumentParser(description='Start MCP server with Docker Python execution')
     parser.add_argument('--code-dir', type=str,
                         help='Directory path where code will be stored')
@@ -152,8 +427,31 @@ def main():
                         help='Time in seconds before idle containers are removed (default: 600)')
     parser.add_argument('--max-containers', type=int, default=10,
                         help='Maximum number of containers to keep in the pool (default: 10)')
+    parser.add_argument('--max-parallel-exec', type=int, default=None,
+                        help='Maximum number of executions running at once; each can use up to 512 MB '
+                             '(default: same as --max-containers)')
+    parser.add_argument('--max-output-bytes', type=int, default=MAX_OUTPUT_BYTES,
+                        help='Maximum bytes of output captured per execution; a script that prints more '
+                             f'is stopped (default: {MAX_OUTPUT_BYTES})')
+    parser.add_argument('--exec-timeout', type=float, default=EXEC_TIMEOUT,
+                        help=f'Seconds an execution may run before it is stopped (default: {EXEC_TIMEOUT})')
+    parser.add_argument('--max-read-bytes', type=int, default=MAX_READ_BYTES,
+                        help=f'Largest file read_file will return (default: {MAX_READ_BYTES})')
+    parser.add_argument('--prewarm', type=int, default=2,
+                        help='Number of containers to start before serving requests (default: 2)')
+    parser.add_argument('--exec-tmpfs', type=str,
+                        default='/dev/shm' if os.path.isdir('/dev/shm') else None,
+                        help='Memory-backed directory to create a private script staging directory in '
+                             '(default: /dev/shm when available, otherwise scripts are '
+                             'copied straight into the container)')
     args = parser.parse_args()
 
+    # Local socket (unix socket / named pipe) unless DOCKER_HOST says otherwise.
+    # Size the connection pool for one exec per pooled container plus the events
+    # stream and background cleanup, so concurrent calls never open and discard
+    # extra connections.
+    client = docker.from_env(max_pool_size=args.max_containers + 2)
+
     # Ensure the code directory exists
     code_dir = args.code_dir
     if not code_dir:
@@ -162,192 +460,396 @@ def main():
 
     image_name = args.image
     os.makedirs(code_dir, exist_ok=True)
+    code_dir_path = pathlib.Path(code_dir).resolve()
+    code_dir_prefix = os.path.join(str(code_dir_path), '')
+    
+    # Stage scripts on tmpfs when possible so they never reach the disk; without
+    # one they are sent to the container as an archive. User files stay in code_dir.
+    if args.exec_tmpfs:
+        # A fresh 0700 directory per server: /dev/shm is world-writable, so a
+        # fixed path could be pre-created or shared by another user or server
+        exec_dir = tempfile.mkdtemp(prefix='mcp-exec-', dir=args.exec_tmpfs)
+        exec_mount = '/exec'
+    container_host_config = _build_host_config()
+    container_env = _filter_environment()
+    logger.info("Passing %d environment variables to containers", len(container_env))
     
     # Configure container manager
     container_manager.max_idle_time = args.idle_timeout
     container_manager.max_containers = args.max_containers
-    container_manager.start_cleanup_thread()
-    logging.info(f"Container idle timeout set to {args.idle_timeout} seconds, max containers: {args.max_containers}")
+    max_parallel_exec = args.max_parallel_exec or args.max_containers
+    max_output_bytes = args.max_output_bytes
+    max_read_bytes = args.max_read_bytes
+    exec_timeout = args.exec_timeout
+    exec_executor = ThreadPoolExecutor(max_workers=args.max_containers, thread_name_prefix='python-exec')
+    # Separate from exec_executor: execution threads wait on these calls, so
+    # sharing one pool could deadlock once every worker is executing
+    docker_io_executor = ThreadPoolExecutor(max_workers=DOCKER_IO_WORKERS, thread_name_prefix='docker-io')
+    # Created once rather than per call; threads only start when a cleanup first runs
+    cleanup_executor = ThreadPoolExecutor(max_workers=CLEANUP_WORKERS, thread_name_prefix='cleanup')
+    container_manager.start_event_thread(client)
+    # Sweeping leftovers and pre-warming can take a while (the first creation
+    # may pull the image); do it in the background so the MCP handshake never
+    # waits on Docker
+    threading.Thread(
+        target=_warm_up_pool,
+        args=(min(args.prewarm, args.max_containers),),
+        name='pool-warmup',
+        daemon=True
+    ).start()
+    # SIGTERM (e.g. `docker stop`, service managers) bypasses atexit, which would
+    # leave the pooled containers running
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    logger.info("Container idle timeout set to %s seconds, max containers: %s", args.idle_timeout, args.max_containers)
 
     # Create and run the server
     mcp.run()
 
+def _run_in_thread(func):
+    """Expose a blocking tool function as a coroutine that runs it in a worker thread.
+
+    FastMCP calls plain functions directly on the event loop, so any file or
+    Docker I/O inside a tool would stall every other in-flight request.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
 def _sanitize_path(relative_path):
     """Helper to sanitize and validate a relative path"""
     # Convert to Path object to handle different path formats
     path_obj = pathlib.Path(relative_path)
     
-    # Ensure the path is relative and doesn't try to escape
+    # Ensure the path is relative
     if path_obj.is_absolute():
         raise ValueError("Path must be relative, not absolute")
-        
-    if ".." in path_obj.parts:
-        raise ValueError("Path cannot contain '..' to navigate up directories")
     
-    # Get the absolute path and resolve any symlinks
-    code_dir_path = pathlib.Path(code_dir).resolve()
-    target_path = (code_dir_path / path_obj).resolve()
+    # Resolve '..' and any symlinks against the code directory resolved at startup
+    target = str((code_dir_path / path_obj).resolve())
     
-    # Ensure the resolved path is still within code_dir
-    if code_dir_path not in target_path.parents and target_path != code_dir_path:
+    # Ensure the resolved path is still within code_dir; a plain string prefix
+    # test, since both sides are already resolved
+    if not target.startswith(code_dir_prefix) and target != str(code_dir_path):
         raise ValueError("Path must stay within the code directory")
     
-    return str(target_path)
+    return target
+
+def _filter_environment():
+    """Return the server's environment without system variables (see SYSTEM_ENV_PREFIXES)"""
+    return {
+        key: value
+        for key, value in os.environ.items()
+        if not key.upper().startswith(SYSTEM_ENV_PREFIXES)
+    }
+
+def _get_image_id():
+    """Resolve image_name to its image id on first use, pulling the image if it is missing.
 
-@mcp.tool()
-def execute_python_in_container(code: str) -> str:
+    Creating containers from the id skips the daemon's name lookup on every
+    creation and pins the pool to one image even if the tag is moved later.
+    Failures are not cached, so they surface as tool errors and the next
+    creation tries again.
     """
-    Execute Python code in a Docker container. The environment is limited to the container.
-    Following packages are available:
-    "pandas", "numpy", "matplotlib", "seaborn", "plotly", "bokeh", "hvplot",
-    "datashader", "plotnine", "cufflinks", "graphviz", "scipy", "statsmodels",
-    "openpyxl", "xlrd", "xlsxwriter", "pandasql", "csv23", "csvkit", "polars",
-    "pyarrow", "fastparquet", "dask", "vaex", "python-dateutil", "elasticsearch",
-    "psycopg2-binary", "beautifulsoup4", "requests", "lxml", "geopandas",
-    "folium", "pydeck", "holoviews", "altair", "visualkeras", "kaleido",
-    "panel", "voila", "pymongo"
+    global image_id
+    with _image_lock:
+        if image_id is None:
+            try:
+                image_id = client.images.get(image_name).id
+            except docker.errors.ImageNotFound:
+                logger.info("Image %s not found locally, pulling it", image_name)
+                image_id = client.images.pull(image_name).id
+        return image_id
 
-    Use following environment variables (if the connection string is available):
-    - MONGO_URI: MongoDB connection string
-    - ELASTIC_URI: ElasticSearch connection string
-    - REDIS_URI: Redis connection string
-    - POSTGRES_URI: PostgreSQL connection string
-    - MYSQL_URI: MySQL connection string
-    
-    Args:
-        code: Python code to execute
+def _build_host_config():
+    """Build the HostConfig shared by every pool container.
 
-    Returns:
-        Output from executed code
+    Mounts, limits and security options never change after startup, so this
+    is serialized once instead of on every container creation.
     """
+    # code_dir read-write for user files; _create_container adds the
+    # container's own script directory
+    binds = {code_dir: {'bind': '/code', 'mode': 'rw'}}
+    return client.api.create_host_config(
+        binds=binds,
+        mem_limit="512m",
+        cap_drop=["ALL"],
+        security_opt=["no-new-privileges"],
+        network_mode="none"
+    )
+
+def _create_container():
+    """Create and start a pool container through the low-level API.
+
+    containers.run() costs an extra inspect round trip per container just to
+    build the model object; create + start is all the pool needs.
+    Returns (container, script_dir); script_dir is None without a tmpfs.
+    """
+    api = client.api
+    host_config = container_host_config
     script_dir = None
+    if exec_dir:
+        # A private, read-only script directory per container, so executions in
+        # different containers never share a directory (or a file name)
+        script_dir = os.path.join(exec_dir, f"c-{secrets.token_hex(8)}")
+        os.mkdir(script_dir)
+        host_config = dict(
+            container_host_config,
+            Binds=container_host_config['Binds'] + [f"{script_dir}:{exec_mount}:ro"]
+        )
     try:
-        # Use the code directory directly since we're reusing containers
-        script_dir = code_dir
-        os.makedirs(script_dir, exist_ok=True)
-        
-        script_path = os.path.join(script_dir, "script.py")
-        
-        with open(script_path, "w") as f:
-            f.write(code)
-        
-        # Filter out system environment variables
-        system_env_prefixes = [
-            "PATH", "TEMP", "TMP", "HOME", "USER", 
-            "APPDATA", "LOCALAPPDATA", "PROGRAMDATA",
-            "SYSTEM", "PUBLIC", "COMPUTER", "OS", 
-            "PROCESSOR", "PROGRAM", "WIN", "COMMON", 
-            "PATH" # Listed twice deliberately as it's critical to exclude
-        ]
-        
-        # Get non-system environment variables
-        env_vars = {}
-        for key, value in os.environ.items():
-            # Skip variables that start with system prefixes
-            if not any(key.upper().startswith(prefix) for prefix in system_env_prefixes):
-                env_vars[key] = value
-                
-        logging.info(f"Passing {len(env_vars)} environment variables to container")
-        
-        # First, try to get an available container for reuse
-        container = container_manager.get_available_container()
-        reusing_container = container is not None
-        
-        if not container and container_manager.should_create_new_container():
-            # No available containers, create a new one
-            container = client.containers.run(
-                image=image_name,
-                command=["sleep", "3600"],  # Initially just sleep, we'll execute code later
-                volumes={script_dir: {'bind': '/code', 'mode': 'rw'}},
-                detach=True,
-                remove=False,  # Set to False to prevent automatic removal
-                mem_limit="512m",
-                cap_drop=["ALL"],
-                security_opt=["no-new-privileges"],
-                environment=env_vars,
-                network="none",
-                auto_remove=True
-            )
-            
-            # Add the container to the manager for tracking
-            container_manager.add_container(container)
-            logging.info(f"Created new container {container.id} (total active: {container_manager.get_container_count()})")
-        elif not container:
-            # Hit the max container limit, wait for an available container
-            logging.info("Maximum container limit reached, waiting for an available container...")
-            max_wait_time = 30  # Maximum time to wait in seconds
-            wait_interval = 0.5  # Check every half second
-            waited_time = 0
-            
-            while waited_time < max_wait_time:
-                container = container_manager.get_available_container()
-                if container:
-                    reusing_container = True
-                    break
-                time.sleep(wait_interval)
-                waited_time += wait_interval
-            
-            if not container:
-                return "Error: Maximum container limit reached and no containers became available in time"
-        
+        container_id = api.create_container(
+            image=_get_image_id(),
+            # Idle until removed by the pool; code runs through exec
+            command=["sleep", "infinity"],
+            environment=container_env,
+            host_config=host_config,
+            labels={POOL_LABEL: f"{socket.gethostname()}:{os.getpid()}"}
+        )['Id']
+        api.start(container_id)
+    except Exception:
+        if script_dir:
+            shutil.rmtree(script_dir, ignore_errors=True)
+        raise
+    return client.containers.prepare_model({'Id': container_id}), script_dir
+
+def _owner_alive(pid):
+    """Whether the server process that labeled a pool container still runs"""
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows, and there is
+        # no portable probe; treat the owner as gone
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _remove_leftover_containers():
+    """Force-remove pool containers left behind by servers that crashed or were killed.
+
+    Pool containers run until removed, so nothing else would ever stop them.
+    Only containers whose owner on this host is gone are removed; servers
+    sharing the Docker daemon keep their pools.
+    """
+    host = socket.gethostname()
+    for info in client.api.containers(all=True, filters={'label': POOL_LABEL}):
+        owner_host, _, pid = (info.get('Labels') or {}).get(POOL_LABEL, '').rpartition(':')
+        if owner_host != host or not pid.isdigit() or _owner_alive(int(pid)):
+            continue
         try:
-            if reusing_container:
-                # For existing containers, we need to execute the script directly
-                logging.info(f"Executing code in existing container {container.id}")
-                pass
+            client.api.remove_container(info['Id'], force=True)
+            logger.info("Removed leftover pool container %s", info['Id'])
+        except docker.errors.NotFound:
+            pass
+        except Exception as e:
+            logger.warning("Error removing leftover container %s: %s", info['Id'], e)
 
-            # Execute the script in the container
-            exec_result = container.exec_run(
-                cmd=["python", "/code/script.py"],
-                environment=env_vars
-            )
-            
-            # Mark the container as available for reuse
-            container_manager.mark_container_as_available(container.id)
-            
-            # Check if execution was successful
-            if exec_result.exit_code != 0:
-                return f"Error executing code (exit code {exec_result.exit_code}):\n{exec_result.output.decode('utf-8')}"
-                
-            # Clean up - just delete the script file, not the directory
-            if os.path.exists(script_path):
+def _warm_up_pool(count):
+    """Background startup: sweep leftover pool containers, then pre-warm count new ones"""
+    try:
+        _remove_leftover_containers()
+    except Exception as e:
+        logger.warning("Error looking for leftover pool containers: %s", e)
+    _prewarm_containers(count)
+
+def _prewarm_containers(count):
+    """Start count idle pool containers in parallel so early requests skip container startup"""
+    def create(_):
+        # Requests may already be creating containers; never exceed the pool size
+        if not container_manager.reserve_slot():
+            return
+        try:
+            container, script_dir = _create_container()
+        except Exception as e:
+            container_manager.release_reservation()
+            logger.warning("Error pre-warming container: %s", e)
+            return
+        container_manager.add_container(container, script_dir=script_dir, reserved=True)
+    
+    if count > 0:
+        list(docker_io_executor.map(create, range(count)))
+        logger.info("Pre-warmed %d containers", container_manager.get_container_count())
+
+def _exec_in_container(container, cmd):
+    """Run a command in a pool container and return (exit_code, output, stopped).
+
+    Output chunks are streamed into one bytearray and decoded once; invalid
+    UTF-8 from the script is replaced rather than failing the whole call.
+    A script whose output grows past max_output_bytes, or that runs longer
+    than exec_timeout, is stopped by discarding its container; stopped is then
+    "output" or "timeout" and exit_code is None. Otherwise stopped is None.
+    """
+    api = client.api
+    # No environment= here: pool containers were created with container_env,
+    # which every exec inherits
+    exec_id = api.exec_create(container.id, cmd)['Id']
+    output = bytearray()
+    
+    # Docker cannot kill a single exec; removing its container is the only way
+    # to stop a script that keeps printing or never finishes
+    timed_out = threading.Event()
+    
+    def stop_on_timeout():
+        timed_out.set()
+        container_manager.discard_container(container.id)
+    
+    deadline = threading.Timer(exec_timeout, stop_on_timeout)
+    deadline.daemon = True
+    deadline.start()
+    try:
+        stream = api.exec_start(exec_id, stream=True)
+        for chunk in stream:
+            remaining = max_output_bytes - len(output)
+            if len(chunk) > remaining:
+                # Copy only up to the cap, so the buffer never grows past it
+                output += memoryview(chunk)[:remaining]
+                # Discard first, so the script is stopped even if closing the stream fails
+                container_manager.discard_container(container.id)
                 try:
-                    os.remove(script_path)
+                    stream.close()
                 except Exception as e:
-                    logging.warning(f"Error deleting script file: {str(e)}")
-            
-            # Return the successful result
-            return exec_result.output.decode('utf-8')
+                    logger.warning("Error closing output stream of container %s: %s", container.id, e)
+                return None, output.decode('utf-8', errors='replace'), "output"
+            output += chunk
+    except Exception:
+        # Removing the container mid-read can surface as a connection error
+        if not timed_out.is_set():
+            raise
+    finally:
+        deadline.cancel()
+    if timed_out.is_set():
+        return None, output.decode('utf-8', errors='replace'), "timeout"
+    return _exec_exit_code(exec_id), output.decode('utf-8', errors='replace'), None
+
+def _exec_exit_code(exec_id):
+    """Exit code of a finished exec.
+
+    The daemon can still report the exec as running, with ExitCode None, just
+    after its output stream ends, so re-inspect briefly until it has stopped.
+    """
+    for _ in range(EXIT_CODE_POLLS):
+        state = client.api.exec_inspect(exec_id)
+        if not state['Running']:
+            break
+        time.sleep(EXIT_CODE_POLL_INTERVAL)
+    return state['ExitCode']
+
+def _stage_script(container, code):
+    """Stage code as a script for container and return its path inside the container.
+
+    The container is checked out to us alone, so a fixed name cannot clash;
+    each script simply replaces the previous one.
+    """
+    data = code.encode('utf-8')
+    if not exec_dir:
+        # No tmpfs: copy the script into the container's own /tmp so it never
+        # touches the host filesystem
+        info = tarfile.TarInfo(IN_CONTAINER_SCRIPT)
+        info.size = len(data)
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode='w') as tar:
+            tar.addfile(info, io.BytesIO(data))
+        client.api.put_archive(container.id, '/tmp', buf.getvalue())
+        return f"/tmp/{IN_CONTAINER_SCRIPT}"
+    script_dir = container_manager.get_script_dir(container.id)
+    if script_dir is None:
+        raise RuntimeError(f"container {container.id} was removed from the pool")
+    script_path = os.path.join(script_dir, IN_CONTAINER_SCRIPT)
+    # Write then rename, so the container can never see a half-written script
+    tmp_path = script_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, script_path)
+    except OSError:
+        _silent_unlink(tmp_path)
+        raise
+    return f"{exec_mount}/{IN_CONTAINER_SCRIPT}"
+
+@mcp.tool(description=EXECUTE_TOOL_DESCRIPTION)
+async def execute_python_in_container(code: str) -> str:
+    """Execute Python code in a pooled Docker container; clients see EXECUTE_TOOL_DESCRIPTION"""
+    global exec_semaphore
+    if exec_semaphore is None:
+        # Created lazily so it belongs to the server's running event loop
+        exec_semaphore = asyncio.Semaphore(max_parallel_exec or container_manager.max_containers)
+    
+    # Excess calls wait here on the event loop instead of occupying a worker
+    # thread; this bounds peak container memory to max_parallel_exec * mem_limit
+    async with exec_semaphore:
+        # Executions get their own worker threads, sized to the container pool, so
+        # they overlap fully and never queue other tools behind long-running scripts
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(exec_executor, _execute_code, code)
+
+@contextlib.contextmanager
+def _checkout():
+    """Check out a pool container for one execution, returning it to the pool on exit.
+
+    Reuses an idle container, creates one while the pool has room, and
+    otherwise waits until one is released or removed. Yields None if neither
+    happened in time.
+    """
+    # First, try to get an available container for reuse or a slot for a new one
+    container, reserved = container_manager.acquire_container()
+    
+    if not container and not reserved:
+        # Hit the max container limit, wait for an available container
+        logger.info("Maximum container limit reached, waiting for an available container...")
+        max_wait_time = 30  # Maximum time to wait in seconds
+        container, reserved = container_manager.acquire_container(max_wait_time)
+        if not container and not reserved:
+            yield None
+            return
+    
+    if reserved:
+        # Create the new container without holding the pool lock
+        try:
+            container, script_dir = _create_container()
+        except Exception:
+            container_manager.release_reservation()
+            raise
+        
+        # Add the container to the manager for tracking, already checked out to us
+        container_manager.add_container(container, busy=True, script_dir=script_dir, reserved=True)
+        logger.info("Created new container %s (total active: %d)", container.id, container_manager.get_container_count())
+    
+    try:
+        yield container
+    finally:
+        # Also on errors; a container that was discarded meanwhile is no longer
+        # tracked, which makes this a no-op
+        container_manager.mark_container_as_available(container.id)
+
+def _execute_code(code):
+    """Run code in a pooled container; blocking body of execute_python_in_container"""
+    try:
+        with _checkout() as container:
+            if container is None:
+                return "Error: Maximum container limit reached and no containers became available in time"
             
-        except Exception as e:
-            # If there's an error, mark the container as available
-            # If it's a serious error with the container itself, it will be cleaned up separately
-            try:
-                container_manager.mark_container_as_available(container.id)
-            except Exception as mark_error:
-                logging.warning(f"Failed to mark container as available after error: {mark_error}")
-                
-            # Clean up script file on error too
-            if os.path.exists(script_path):
-                try:
-                    os.remove(script_path)
-                except Exception as clean_error:
-                    logging.warning(f"Error deleting script file after error: {str(clean_error)}")
-                    
-            # Return error message
-            return f"Error executing code: {str(e)}"
+            # Execute the script in the container
+            script_path = _stage_script(container, code)
+            exit_code, output, stopped = _exec_in_container(container, ["python", script_path])
     except Exception as e:
-        # Clean up even if there's an error
-        if script_path and os.path.exists(script_path):
-            try:
-                os.remove(script_path)
-                logging.info(f"Deleted script file after error: {script_path}")
-            except Exception as clean_error:
-                logging.warning(f"Error deleting script file after main error: {str(clean_error)}")
-            
         return f"Error executing code: {str(e)}"
+    
+    # Check if execution was successful
+    if stopped == "output":
+        return f"Error executing code (stopped after exceeding {max_output_bytes} bytes of output):\n{output}"
+    if stopped == "timeout":
+        return f"Error executing code (stopped after running for {exec_timeout:g} seconds):\n{output}"
+    if exit_code != 0:
+        return f"Error executing code (exit code {exit_code}):\n{output}"
+    
+    # Return the successful result
+    return output
 
 # @mcp.tool()
+@_run_in_thread
 def list_directory(relative_path: str = "") -> str:
     """
     List the contents of a directory within the code directory where python code is executed
@@ -369,48 +871,47 @@ def list_directory(relative_path: str = "") -> str:
         if not os.path.isdir(dir_path):
             return f"Error: Directory does not exist: {relative_path}"
         
-        # List contents
-        items = os.listdir(dir_path)
+        # List contents in one pass; DirEntry caches the file type from the
+        # directory read, so only files need a stat call for their size
+        with os.scandir(dir_path) as it:
+            entries = list(it)
         
-        if not items:
+        if not entries:
             return f"Directory is empty: {relative_path or '.'}"
         
-        result = f"Contents of {relative_path or '.'} (total: {len(items)}):\n"
+        parts = [f"Contents of {relative_path or '.'} (total: {len(entries)}):\n"]
         
         # Separate directories and files
         dirs = []
         files = []
         
-        for item in items:
-            item_path = os.path.join(dir_path, item)
-            if os.path.isdir(item_path):
-                dirs.append(f"📁 {item}/")
+        for entry in entries:
+            if entry.is_dir():
+                dirs.append(entry.name)
             else:
-                size = os.path.getsize(item_path)
-                files.append(f"📄 {item} ({_format_size(size)})")
+                files.append((entry.name, entry.stat().st_size))
         
         # Sort and add to result
-        for d in sorted(dirs):
-            result += f"{d}\n"
+        parts.extend(f"📁 {name}/\n" for name in sorted(dirs))
+        parts.extend(f"📄 {name} ({_format_size(size)})\n" for name, size in sorted(files, key=operator.itemgetter(0)))
         
-        for f in sorted(files):
-            result += f"{f}\n"
-        
-        return result
+        return "".join(parts)
     except ValueError as e:
         return f"Error: {str(e)}"
     except Exception as e:
         return f"Error listing directory: {str(e)}"
 
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
 def _format_size(size_bytes):
     """Format file size in human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.1f} TB"
+    # Each unit is 2**10 of the previous one, so the unit index falls out of the
+    # bit length directly instead of a divide-and-compare loop
+    unit = min((int(size_bytes).bit_length() - 1) // 10, 4) if size_bytes >= 1024 else 0
+    return f"{size_bytes / (1 << (unit * 10)):.1f} {_SIZE_UNITS[unit]}"
 
 # @mcp.tool()
+@_run_in_thread
 def read_file(relative_path: str) -> str:
     """
     Read a file from the code directory where python code is executed
@@ -429,9 +930,19 @@ def read_file(relative_path: str) -> str:
         if not os.path.isfile(file_path):
             return f"Error: File does not exist: {relative_path}"
         
-        # Read file
-        with open(file_path, 'r') as f:
-            content = f.read()
+        # Read file as bytes and decode once; text mode would add a
+        # newline-translation pass and fail outright on non-UTF-8 bytes
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > max_read_bytes:
+                return f"Error: File is too large to read ({size} bytes, limit is {max_read_bytes}): {relative_path}"
+            if hasattr(os, 'posix_fadvise'):
+                # Whole-file read: let the kernel use a larger read-ahead window
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            # Sized read: one buffer of the right size, no growth or EOF probe.
+            # Not mmap: containers can truncate files in code_dir mid-read, and
+            # touching a truncated mapping kills the server with SIGBUS.
+            content = f.read(size).decode('utf-8', errors='replace')
         
         return f"Contents of {relative_path}:\n\n{content}"
     except ValueError as e:
@@ -440,6 +951,7 @@ def read_file(relative_path: str) -> str:
         return f"Error reading file: {str(e)}"
 
 # @mcp.tool()
+@_run_in_thread
 def write_file(relative_path: str, content: str) -> str:
     """
     Write content to a file in the code directory where python code is executed
@@ -469,6 +981,7 @@ def write_file(relative_path: str, content: str) -> str:
         return f"Error writing file: {str(e)}"
 
 # @mcp.tool()
+@_run_in_thread
 def delete_file(relative_path: str) -> str:
     """
     Delete a file from the code directory where python code is executed
@@ -497,6 +1010,7 @@ def delete_file(relative_path: str) -> str:
         return f"Error deleting file: {str(e)}"
 
 # @mcp.tool()
+@_run_in_thread
 def get_directory_tree(relative_path: str = "") -> str:
     """
     Get an ASCII tree representation of a directory structure where python code is executed
@@ -521,47 +1035,70 @@ def get_directory_tree(relative_path: str = "") -> str:
             return f"Error: Directory does not exist: {relative_path}"
         
         # Generate the tree
-        result = f"{display_path}\n"
-        result += _generate_tree(dir_path, code_dir, prefix="")
+        parts = [f"{display_path}\n"]
+        _generate_tree(dir_path, parts)
         
-        return result
+        return "".join(parts)
     except ValueError as e:
         return f"Error: {str(e)}"
     except Exception as e:
         return f"Error generating directory tree: {str(e)}"
 
-def _generate_tree(path, base_path, prefix=""):
-    """Recursively generate tree structure"""
-    if not os.path.isdir(path):
-        return ""
-    
-    result = ""
-    items = sorted(os.listdir(path))
-    
-    # Get relative path for display
-    rel_path = os.path.relpath(path, base_path)
-    if rel_path == ".":
-        rel_path = ""
-    
-    for i, item in enumerate(items):
-        item_path = os.path.join(path, item)
-        is_last = i == len(items) - 1
+def _sorted_entries(path):
+    """One directory's DirEntry objects, sorted by name"""
+    with os.scandir(path) as it:
+        return sorted(it, key=operator.attrgetter('name'))
+
+def _generate_tree(root, parts):
+    """Append an ASCII tree of root's contents to parts.
+
+    A single iterative pass with one scandir per directory; types and sizes
+    come from the DirEntry objects. Symlinks are listed but never followed,
+    so a link back up the tree cannot make the walk loop.
+    """
+    # Depth-first; each frame is (sorted entries, line prefix, next index)
+    stack = [(_sorted_entries(root), "", 0)]
+    while stack:
+        entries, prefix, i = stack.pop()
+        if i == len(entries):
+            continue
+        stack.append((entries, prefix, i + 1))
         
-        # Add item to result
-        result += f"{prefix}{'└── ' if is_last else '├── '}{item}"
+        entry = entries[i]
+        is_last = i == len(entries) - 1
+        connector = '└── ' if is_last else '├── '
         
-        if os.path.isdir(item_path):
-            result += "/\n"
-            # Update prefix for children
-            new_prefix = prefix + ('    ' if is_last else '│   ')
-            result += _generate_tree(item_path, base_path, new_prefix)
+        if entry.is_dir(follow_symlinks=False):
+            parts.append(f"{prefix}{connector}{entry.name}/\n")
+            # Children go on top of the stack so they render before our next sibling
+            stack.append((_sorted_entries(entry.path), prefix + ('    ' if is_last else '│   '), 0))
         else:
-            size = os.path.getsize(item_path)
-            result += f" ({_format_size(size)})\n"
-    
-    return result
+            size = entry.stat(follow_symlinks=False).st_size
+            parts.append(f"{prefix}{connector}{entry.name} ({_format_size(size)})\n")
+
+def _silent_unlink(path):
+    """Unlink path with a single syscall; already gone is fine, other failures are logged"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Error deleting %s: %s", path, e)
+
+def _remove_entry(entry):
+    """Remove a directory entry, recursing into real directories but not symlinks"""
+    if entry.is_dir(follow_symlinks=False):
+        shutil.rmtree(entry.path, ignore_errors=True)
+    else:
+        # A running script may delete its own files while we clean up; any
+        # other failure propagates so the tool reports the cleanup as failed
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
 
 # @mcp.tool()
+@_run_in_thread
 def cleanup_code_directory() -> str:
     """
     Clean up the code directory by removing all files and subdirectories
@@ -570,12 +1107,11 @@ def cleanup_code_directory() -> str:
         Status message
     """
     try:
-        for item in os.listdir(code_dir):
-            item_path = os.path.join(code_dir, item)
-            if os.path.isdir(item_path):
-                shutil.rmtree(item_path, ignore_errors=True)
-            else:
-                os.remove(item_path)
+        with os.scandir(code_dir) as it:
+            entries = list(it)
+        
+        # Independent subtrees are unlinked in parallel rather than one by one
+        list(cleanup_executor.map(_remove_entry, entries))
         
         return f"Successfully cleaned up code directory: {code_dir}"
     except Exception as e: